@@ -52,7 +52,7 @@ def main() -> None:
     size = sum([x[1] for x in list_result])
     print(f"Starting download of: {size} bytes of data...")
     download_params = download.DataFluxDownloadOptimizationParams(
-        args.max_compose_bytes
+        args.max_compose_bytes, max_workers=args.num_workers
     )
     download_start_time = time.time()
     print(f"Download operation started at {download_start_time}")
@@ -17,22 +17,36 @@
 from __future__ import annotations
 
 from google.cloud import storage
+from google.cloud.storage.exceptions import DataCorruption
 from google.cloud.storage.retry import DEFAULT_RETRY
 from google.api_core.client_info import ClientInfo
-
+from google.api_core.exceptions import PreconditionFailed
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+import google_crc32c
+
+import os
+import asyncio
+import bisect
+import collections
+import functools
 import uuid
 import logging
 import multiprocessing
 import itertools
 import math
+import operator
 import queue
 import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from typing import Iterator
 
 import signal
 import sys
 
 # https://cloud.google.com/storage/docs/retry-strategy#python.
+# Built once and passed explicitly to each request, so that the library defaults of other
+# google-cloud-storage users in the process are left untouched.
 MODIFIED_RETRY = DEFAULT_RETRY.with_deadline(300.0).with_delay(
     initial=1.0, multiplier=1.2, maximum=45.0
 )
@@ -42,7 +56,313 @@ MAX_NUM_OBJECTS_TO_COMPOSE = 32
 
 COMPOSED_PREFIX = "dataflux-composed-objects/"
 
-current_composed_object = None
+# Objects larger than this are downloaded with parallel range requests instead of a single stream.
+SINGLE_STREAM_THRESHOLD = 32 * 1024 * 1024
+
+# Shared pool used to fan out composite object deletes and intermediate compose calls.
+_DELETE_POOL = ThreadPoolExecutor(max_workers=256)
+
+# Shared pool used to fan out the object downloads of a single group.
+_DOWNLOAD_POOL = ThreadPoolExecutor(max_workers=256)
+
+# Composite objects that have been created but not yet deleted, keyed by name.
+current_composed_objects: dict[str, object] = {}
+
+
+# Size of the HTTPS connection pool of the clients created by _get_client.
+DEFAULT_CONNECTION_POOL_SIZE = 64
+
+# Clients created by _get_client, keyed by project name, shared by every call in the process.
+_DEFAULT_CLIENTS: dict[str, object] = {}
+_DEFAULT_CLIENTS_LOCK = threading.Lock()
+
+# Semaphores bounding the concurrent requests on each client, see _connection_slots.
+_CONNECTION_SLOTS = weakref.WeakKeyDictionary()
+_CONNECTION_SLOTS_LOCK = threading.Lock()
+
+# gRPC storage clients created by _get_grpc_client, keyed by credentials, least recently
+# used first. At most _GRPC_CLIENTS_SIZE are kept; the channels of evicted clients are closed.
+_GRPC_CLIENTS: collections.OrderedDict[object, object] = collections.OrderedDict()
+_GRPC_CLIENTS_SIZE = 8
+
+# Bucket handles created by _get_bucket, keyed by client and then by bucket name.
+_BUCKETS = weakref.WeakKeyDictionary()
+_BUCKETS_LOCK = threading.Lock()
+
+# Per-thread buffers of random UUID bytes used by _next_composite_name.
+_UUID_POOL = threading.local()
+_UUID_POOL_SIZE = 256
+
+# Outcome of ensure_composed_lifecycle, keyed by client and then by bucket name.
+_COMPOSED_LIFECYCLE = weakref.WeakKeyDictionary()
+_COMPOSED_LIFECYCLE_LOCK = threading.Lock()
+
+# Attempts ensure_composed_lifecycle makes when the bucket metadata changes under it.
+_LIFECYCLE_PATCH_ATTEMPTS = 3
+
+# Transports supported by DataFluxDownloadOptimizationParams.transport.
+TRANSPORTS = ("rest", "grpc")
+
+
+def _reset_after_fork():
+    # Worker threads and open connections do not survive a fork, so child processes
+    # need fresh pools and clients.
+    global _DELETE_POOL, _DOWNLOAD_POOL, _DEFAULT_CLIENTS_LOCK
+    _DELETE_POOL = ThreadPoolExecutor(max_workers=256)
+    _DOWNLOAD_POOL = ThreadPoolExecutor(max_workers=256)
+    _DEFAULT_CLIENTS.clear()
+    _GRPC_CLIENTS.clear()
+    _DEFAULT_CLIENTS_LOCK = threading.Lock()
+    global _CONNECTION_SLOTS_LOCK, _COMPOSED_LIFECYCLE_LOCK
+    _CONNECTION_SLOTS.clear()
+    _CONNECTION_SLOTS_LOCK = threading.Lock()
+    _COMPOSED_LIFECYCLE.clear()
+    _COMPOSED_LIFECYCLE_LOCK = threading.Lock()
+    global _BUCKETS_LOCK
+    _BUCKETS.clear()
+    _BUCKETS_LOCK = threading.Lock()
+    # The forking thread is the only one left; its buffered UUIDs are shared with the
+    # parent and must not be handed out again.
+    _UUID_POOL.buf = []
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _next_composite_name() -> str:
+    """Return a unique name for a composite object.
+
+    The random UUIDs are taken from a per-thread buffer that is refilled with a single
+    os.urandom call every _UUID_POOL_SIZE names.
+    """
+    pool = getattr(_UUID_POOL, "buf", None)
+    if not pool:
+        raw = os.urandom(16 * _UUID_POOL_SIZE)
+        pool = [raw[i * 16 : (i + 1) * 16] for i in range(_UUID_POOL_SIZE)]
+        _UUID_POOL.buf = pool
+    return COMPOSED_PREFIX + str(uuid.UUID(bytes=pool.pop(), version=4))
+
+
+def _get_client(
+    project_name: str, pool_size: int = DEFAULT_CONNECTION_POOL_SIZE
+) -> object:
+    """Return the process-wide storage client for the project, creating it on first use.
+
+    Args:
+        project_name: the name of the GCP project.
+        pool_size: the size of the HTTPS connection pool. Only applies when the client is created.
+
+    Returns:
+        the google.cloud.storage.Client initialized with the project.
+    """
+    with _DEFAULT_CLIENTS_LOCK:
+        client = _DEFAULT_CLIENTS.get(project_name)
+        if client is None:
+            client = storage.Client(
+                project=project_name,
+                client_info=ClientInfo(user_agent="dataflux/0.0"),
+            )
+            # The default pool holds 10 connections, which concurrent downloads would serialize on.
+            client._http.mount(
+                "https://",
+                HTTPAdapter(
+                    pool_connections=pool_size,
+                    pool_maxsize=pool_size,
+                    pool_block=False,
+                ),
+            )
+            _DEFAULT_CLIENTS[project_name] = client
+        return client
+
+
+def _connection_slots(storage_client: object) -> threading.BoundedSemaphore:
+    """Return the semaphore that bounds concurrent requests on the client to its pool size.
+
+    Requests beyond the size of the HTTPS connection pool open connections that urllib3
+    discards afterwards ("Connection pool is full"), so fan-outs wait for a free slot instead.
+
+    Args:
+        storage_client: the google.cloud.storage.Client initialized with the project.
+
+    Returns:
+        the semaphore shared by every fan-out on the client.
+    """
+    with _CONNECTION_SLOTS_LOCK:
+        slots = _CONNECTION_SLOTS.get(storage_client)
+        if slots is None:
+            try:
+                size = storage_client._http.get_adapter("https://")._pool_maxsize
+            except AttributeError:
+                size = DEFAULT_POOLSIZE
+            slots = threading.BoundedSemaphore(size)
+            _CONNECTION_SLOTS[storage_client] = slots
+        return slots
+
+
+def _get_grpc_client(storage_client: object) -> object:
+    """Return the gRPC storage client for the credentials of the storage client.
+
+    One gRPC client is created per credentials and shared by every call in the process.
+    All its calls share a single channel, over which HTTP/2 multiplexes the concurrent
+    requests. Only the _GRPC_CLIENTS_SIZE most recently used clients are kept, and the
+    channel of an evicted client is closed. Requires the grpc extra:
+    pip install google-cloud-storage[grpc].
+
+    Args:
+        storage_client: the google.cloud.storage.Client whose credentials authenticate the
+            channel. Without credentials, the application default credentials are used.
+
+    Returns:
+        the google.cloud._storage_v2.StorageClient.
+    """
+    credentials = getattr(storage_client, "_credentials", None)
+    with _DEFAULT_CLIENTS_LOCK:
+        grpc_client = _GRPC_CLIENTS.get(credentials)
+        if grpc_client is not None:
+            _GRPC_CLIENTS.move_to_end(credentials)
+        else:
+            from google.cloud import _storage_v2 as storage_v2
+
+            transport_class = (
+                storage_v2.services.storage.transports.StorageGrpcTransport
+            )
+            channel = transport_class.create_channel(
+                credentials=credentials, options=[("grpc.keepalive_time_ms", 30000)]
+            )
+            grpc_client = storage_v2.StorageClient(
+                transport=transport_class(channel=channel)
+            )
+            _GRPC_CLIENTS[credentials] = grpc_client
+            if len(_GRPC_CLIENTS) > _GRPC_CLIENTS_SIZE:
+                _, evicted = _GRPC_CLIENTS.popitem(last=False)
+                evicted.transport.close()
+        return grpc_client
+
+
+def _grpc_bucket_path(bucket_name: str) -> str:
+    return f"projects/_/buckets/{bucket_name}"
+
+
+def _grpc_compose(
+    grpc_client: object,
+    bucket_name: str,
+    destination_blob_name: str,
+    source_names: list[str],
+):
+    """Compose the source objects into the destination object with a gRPC ComposeObject call.
+
+    Args:
+        grpc_client: the gRPC storage client, see _get_grpc_client.
+        bucket_name: the name of the GCS bucket that holds the objects.
+        destination_blob_name: the name of the composite object to be created.
+        source_names: the names of the objects to compose, at most MAX_NUM_OBJECTS_TO_COMPOSE.
+    """
+    from google.cloud import _storage_v2 as storage_v2
+
+    request = storage_v2.ComposeObjectRequest(
+        destination=storage_v2.Object(
+            bucket=_grpc_bucket_path(bucket_name), name=destination_blob_name
+        ),
+        source_objects=[
+            storage_v2.ComposeObjectRequest.SourceObject(name=name)
+            for name in source_names
+        ],
+    )
+    grpc_client.compose_object(request=request, retry=MODIFIED_RETRY)
+
+
+def _grpc_download(
+    grpc_client: object,
+    bucket_name: str,
+    object_name: str,
+    size_hint: int = None,
+) -> bytes:
+    """Download the contents of an object with a streaming gRPC ReadObject call.
+
+    A stream that breaks off is resumed from the bytes received so far, pinned to the
+    generation of the first response, and retried with MODIFIED_RETRY. As with the JSON
+    API, the crc32c checksums of each response and of the whole object are verified.
+
+    Args:
+        grpc_client: the gRPC storage client, see _get_grpc_client.
+        bucket_name: the name of the GCS bucket that holds the object.
+        object_name: the name of the object to download.
+        size_hint: the expected size of the object in bytes, see download_single.
+
+    Returns:
+        the contents of the object in bytes, or a memoryview when size_hint is provided.
+
+    Raises:
+        DataCorruption: the downloaded bytes do not match their crc32c checksum.
+    """
+    from google.cloud import _storage_v2 as storage_v2
+
+    writer = _BufferWriter(bytearray(size_hint or 0))
+    generation = None
+    object_crc32c = None
+    checksum = google_crc32c.Checksum()
+
+    def read_remaining():
+        nonlocal generation, object_crc32c
+        stream = grpc_client.read_object(
+            request=storage_v2.ReadObjectRequest(
+                bucket=_grpc_bucket_path(bucket_name),
+                object_=object_name,
+                generation=generation,
+                read_offset=writer.pos,
+            ),
+            # Failures, including those midway through the stream, are retried below.
+            retry=None,
+        )
+        for response in stream:
+            # Only the first response carries the object metadata.
+            if generation is None and response.metadata.generation:
+                generation = response.metadata.generation
+            if object_crc32c is None and "crc32c" in response.object_checksums:
+                object_crc32c = response.object_checksums.crc32c
+            data = response.checksummed_data
+            if "crc32c" in data and google_crc32c.value(data.content) != data.crc32c:
+                raise DataCorruption(
+                    response,
+                    f"crc32c mismatch in {object_name} at offset {writer.pos}.",
+                )
+            checksum.update(data.content)
+            writer.write(data.content)
+
+    MODIFIED_RETRY(read_remaining)()
+    if object_crc32c is not None and object_crc32c != int.from_bytes(
+        checksum.digest(), "big"
+    ):
+        raise DataCorruption(None, f"crc32c mismatch in {object_name}.")
+    del writer.buf[writer.pos :]
+    if size_hint is None:
+        return bytes(writer.buf)
+    return memoryview(writer.buf)
+
+
+def _get_bucket(storage_client: object, bucket_name: str) -> object:
+    """Return a bucket handle, reused across calls with the same client and bucket name.
+
+    The cached handle refers to the client through a weak proxy, so that the cache does not
+    keep the client, and with it its HTTP session and connections, alive.
+
+    Args:
+        storage_client: the google.cloud.storage.Client initialized with the project.
+        bucket_name: the name of the GCS bucket.
+
+    Returns:
+        the bucket handle created by storage_client.bucket(bucket_name).
+    """
+    with _BUCKETS_LOCK:
+        buckets = _BUCKETS.setdefault(storage_client, {})
+        bucket = buckets.get(bucket_name)
+        if bucket is None:
+            bucket = storage_client.bucket(bucket_name)
+            if getattr(bucket, "_client", None) is storage_client:
+                bucket._client = weakref.proxy(storage_client)
+            buckets[bucket_name] = bucket
+        return bucket
 
 
 def compose(
@@ -51,6 +371,7 @@ def compose(
     destination_blob_name: str,
     objects: list[tuple[str, int]],
     storage_client: object = None,
+    transport: str = "rest",
 ) -> object:
     """Compose the objects into a composite object, upload the composite object to the GCS bucket and returns it.
 
@@ -61,24 +382,28 @@ def compose(
         destination_blob_name: the name of the composite object to be created.
         objects: A list of tuples which indicate the object names and sizes (in bytes) in the bucket.
             Example: [("object_name_A", 1000), ("object_name_B", 2000)]
+            More than MAX_NUM_OBJECTS_TO_COMPOSE objects are composed through temporary intermediate objects.
         storage_client: the google.cloud.storage.Client initialized with the project.
             If not defined, the function will initialize the client with the project_name.
+        transport: "rest" to compose through the JSON API, "grpc" to compose through gRPC.
 
     Returns:
         the "blob" of the composed object.
     """
-    if len(objects) > MAX_NUM_OBJECTS_TO_COMPOSE:
-        raise ValueError(
-            f"{MAX_NUM_OBJECTS_TO_COMPOSE} objects allowed to compose, received {len(objects)} objects."
-        )
+    storage_client = storage_client or _get_client(project_name)
 
-    if storage_client is None:
-        storage_client = storage.Client(
-            project=project_name,
-            client_info=ClientInfo(user_agent="dataflux/0.0"),
-        )
+    def compose_one(destination, sources):
+        if transport == "grpc":
+            _grpc_compose(
+                _get_grpc_client(storage_client),
+                bucket_name,
+                destination.name,
+                [source.name for source in sources],
+            )
+        else:
+            destination.compose(sources, retry=MODIFIED_RETRY)
 
-    bucket = storage_client.bucket(bucket_name)
+    bucket = _get_bucket(storage_client, bucket_name)
     destination = bucket.blob(destination_blob_name)
 
     sources = list()
@@ -86,7 +411,31 @@ def compose(
         blob_name = each_object[0]
         sources.append(bucket.blob(blob_name))
 
-    destination.compose(sources, retry=MODIFIED_RETRY)
+    # A single compose call accepts at most MAX_NUM_OBJECTS_TO_COMPOSE sources, so larger
+    # inputs are composed as a tree of intermediate objects, one level at a time.
+    intermediates = []
+    try:
+        while len(sources) > MAX_NUM_OBJECTS_TO_COMPOSE:
+            level = []
+            futures = []
+            for i in range(0, len(sources), MAX_NUM_OBJECTS_TO_COMPOSE):
+                intermediate = bucket.blob(_next_composite_name())
+                futures.append(
+                    _DELETE_POOL.submit(
+                        compose_one,
+                        intermediate,
+                        sources[i : i + MAX_NUM_OBJECTS_TO_COMPOSE],
+                    )
+                )
+                level.append(intermediate)
+            intermediates.extend(level)
+            for future in futures:
+                future.result()
+            sources = level
+
+        compose_one(destination, sources)
+    finally:
+        wait([_DELETE_POOL.submit(_safe_delete, blob) for blob in intermediates])
 
     return destination
 
@@ -97,6 +446,8 @@ def decompose(
     composite_object_name: str,
     objects: list[tuple[str, int]],
     storage_client: object = None,
+    zero_copy: bool = False,
+    transport: str = "rest",
 ) -> list[bytes]:
     """Decompose the composite objects and return the decomposed objects contents in bytes.
 
@@ -109,28 +460,54 @@ def decompose(
             Example: [("object_name_A", 1000), ("object_name_B", 2000)]
         storage_client: the google.cloud.storage.Client initialized with the project.
             If not defined, the function will initialize the client with the project_name.
+        zero_copy: When true, return memoryview slices of the downloaded composite object
+            instead of copying each decomposed object into its own bytes object.
+        transport: "rest" to download through the JSON API, "grpc" to download through gRPC.
 
     Returns:
         the contents (in bytes) of the decomposed objects.
     """
-    if storage_client is None:
-        storage_client = storage.Client(
-            project=project_name,
-            client_info=ClientInfo(user_agent="dataflux/0.0"),
-        )
+    storage_client = storage_client or _get_client(project_name)
 
-    res = []
     composed_object_content = download_single(
-        storage_client, bucket_name, composite_object_name
+        storage_client,
+        bucket_name,
+        composite_object_name,
+        size_hint=sum(each_object[1] for each_object in objects),
+        transport=transport,
     )
+    return decompose_bytes(composed_object_content, objects, zero_copy)
 
-    start = 0
-    for each_object in objects:
-        blob_size = each_object[1]
-        content = composed_object_content[start : start + blob_size]
-        res.append(content)
-        start += blob_size
 
+def decompose_bytes(
+    composed_object_content: bytes,
+    objects: list[tuple[str, int]],
+    zero_copy: bool = False,
+) -> list[bytes]:
+    """Split the contents of a composite object into the contents of the objects it was composed from.
+
+    Args:
+        composed_object_content: the contents of the composite object, as bytes or any other
+            object supporting the buffer protocol.
+        objects: A list of tuples which indicate the object names and sizes (in bytes) in the bucket.
+            Example: [("object_name_A", 1000), ("object_name_B", 2000)]
+        zero_copy: When true, return memoryview slices of composed_object_content
+            instead of copying each decomposed object into its own bytes object.
+
+    Returns:
+        the contents (in bytes) of the decomposed objects.
+    """
+    # Groups hold at most MAX_NUM_OBJECTS_TO_COMPOSE objects, too few for vectorizing to pay off.
+    offsets = list(
+        itertools.accumulate(map(operator.itemgetter(1), objects), initial=0)
+    )
+    view = memoryview(composed_object_content)
+    if zero_copy:
+        res = [view[start:end] for start, end in zip(offsets, offsets[1:])]
+    else:
+        res = [bytes(view[start:end]) for start, end in zip(offsets, offsets[1:])]
+
+    start = offsets[-1]
     if start != len(composed_object_content):
         logging.error(
             "decomposed object length = %s bytes, wanted = %s bytes.",
@@ -140,8 +517,42 @@ def decompose(
     return res
 
 
+class _BufferWriter(object):
+    """File-like object that writes downloaded chunks into a preallocated buffer.
+
+    Attributes:
+        buf: The bytearray or memoryview receiving the data. A bytearray grows if more data
+            than expected is written; a memoryview raises instead.
+        pos: The offset at which the next chunk is written.
+    """
+
+    def __init__(self, buf: bytearray | memoryview):
+        self.buf = buf
+        self.pos = 0
+
+    def write(self, data: bytes) -> int:
+        size = len(data)
+        self.buf[self.pos : self.pos + size] = data
+        self.pos += size
+        return size
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        # The download restarts from offset 0 when GCS serves decompressive transcoding.
+        if whence != 0:
+            raise NotImplementedError("only absolute seeks are supported.")
+        self.pos = offset
+        return self.pos
+
+    def tell(self) -> int:
+        return self.pos
+
+
 def download_single(
-    storage_client: object, bucket_name: str, object_name: str
+    storage_client: object,
+    bucket_name: str,
+    object_name: str,
+    size_hint: int = None,
+    transport: str = "rest",
 ) -> bytes:
     """Download the contents of this object as a bytes object and return it.
 
@@ -149,13 +560,134 @@ def download_single(
         storage_client: the google.cloud.storage.Client initialized with the project.
         bucket_name: the name of the GCS bucket that holds the object.
         object_name: the name of the object to download.
+        size_hint: the expected size of the object in bytes. When provided, the object is
+            streamed into a preallocated buffer instead of being accumulated and copied.
+        transport: "rest" to download through the JSON API, "grpc" to download through gRPC.
 
     Returns:
-        the contents of the object in bytes.
+        the contents of the object in bytes. When size_hint is provided, a memoryview backed
+        by the preallocated buffer is returned instead; the buffer lives as long as any view of it.
     """
-    bucket_handle = storage_client.bucket(bucket_name)
+    if transport == "grpc":
+        return _grpc_download(
+            _get_grpc_client(storage_client), bucket_name, object_name, size_hint
+        )
+
+    bucket_handle = _get_bucket(storage_client, bucket_name)
     blob = bucket_handle.blob(object_name)
-    return blob.download_as_bytes(retry=MODIFIED_RETRY)
+    if size_hint is None:
+        return blob.download_as_bytes(retry=MODIFIED_RETRY)
+
+    writer = _BufferWriter(bytearray(size_hint))
+    blob.download_to_file(writer, retry=MODIFIED_RETRY)
+    del writer.buf[writer.pos :]
+    return memoryview(writer.buf)
+
+
+def _batch_get(
+    storage_client: object,
+    bucket_name: str,
+    names: list[str],
+    transport: str = "rest",
+) -> list[bytes]:
+    """Download the contents of several objects concurrently and return them in order.
+
+    GCS batch requests do not support media downloads, so the objects are fetched with
+    individual requests issued concurrently over the client's shared HTTP session. Unlike
+    the compose path, no temporary object is written or deleted. At most as many requests
+    as the client's connection pool holds are in flight at once, see _connection_slots.
+
+    Args:
+        storage_client: the google.cloud.storage.Client initialized with the project.
+        bucket_name: the name of the GCS bucket that holds the objects.
+        names: the names of the objects to download.
+        transport: "rest" to download through the JSON API, "grpc" to download through gRPC.
+
+    Returns:
+        the contents of the objects in bytes, in the same order as names.
+    """
+    slots = _connection_slots(storage_client)
+
+    def get(name):
+        with slots:
+            return download_single(
+                storage_client, bucket_name, name, transport=transport
+            )
+
+    futures = [_DOWNLOAD_POOL.submit(get, name) for name in names]
+    return [future.result() for future in futures]
+
+
+def _parallel_range_get(
+    storage_client: object,
+    bucket_name: str,
+    object_name: str,
+    size: int,
+    chunks: int = 8,
+) -> memoryview:
+    """Download an object as concurrent range requests into a preallocated buffer.
+
+    The ranges are pinned to the generation read from the object metadata, so that an
+    overwrite during the download cannot mix two versions, and cover the size of that
+    generation rather than the expected size. Ranges of gzip-encoded objects would return
+    compressed bytes, so those objects are downloaded as a single stream instead.
+
+    Args:
+        storage_client: the google.cloud.storage.Client initialized with the project.
+        bucket_name: the name of the GCS bucket that holds the object.
+        object_name: the name of the object to download.
+        size: the expected size of the object in bytes, e.g. from a listing. A mismatch with
+            the size in the object metadata is logged.
+        chunks: the number of ranges to split the download into. The last range absorbs the remainder.
+
+    Returns:
+        a memoryview of the buffer holding the contents of the object.
+    """
+    bucket_handle = _get_bucket(storage_client, bucket_name)
+    metadata = bucket_handle.get_blob(object_name, retry=MODIFIED_RETRY)
+    if metadata is None or metadata.content_encoding == "gzip":
+        return memoryview(download_single(storage_client, bucket_name, object_name))
+    blob = bucket_handle.blob(object_name, generation=metadata.generation)
+    if metadata.size != size:
+        logging.error(
+            "object %s is %s bytes, expected %s bytes.",
+            object_name,
+            metadata.size,
+            size,
+        )
+        size = metadata.size
+    buf = bytearray(size)
+    view = memoryview(buf)
+    chunks = max(1, min(chunks, size))
+    chunk_size = size // chunks
+    writers = []
+    futures = []
+    for i in range(chunks):
+        lo = i * chunk_size
+        hi = size if i == chunks - 1 else lo + chunk_size
+        writer = _BufferWriter(view[lo:hi])
+        futures.append(
+            _DOWNLOAD_POOL.submit(
+                blob.download_to_file,
+                writer,
+                start=lo,
+                end=hi - 1,
+                raw_download=True,
+                retry=MODIFIED_RETRY,
+            )
+        )
+        writers.append(writer)
+    for future in futures:
+        future.result()
+
+    downloaded = sum(writer.pos for writer in writers)
+    if downloaded != size:
+        logging.error(
+            "range downloaded object length = %s bytes, wanted = %s bytes.",
+            downloaded,
+            size,
+        )
+    return view
 
 
 class DataFluxDownloadOptimizationParams:
@@ -163,11 +695,37 @@ class DataFluxDownloadOptimizationParams:
 
     Attributes:
         max_composite_object_size: An integer indicating a cap for the maximum size of the composite object.
+        max_workers: The number of threads on which a single dataflux_download call downloads
+            its compose groups concurrently.
+        use_batch_get: When true, fetch the objects of each group directly and concurrently
+            instead of composing, downloading, decomposing and deleting a composite object.
+        range_chunks: The number of parallel range requests used to download an object or composite
+            object larger than SINGLE_STREAM_THRESHOLD. A value of 1 downloads it as a single stream.
+        use_lifecycle_cleanup: When true, composite objects are not deleted after download but
+            left to a bucket lifecycle rule (see ensure_composed_lifecycle) that removes them after a day.
+        transport: "rest" (default) to compose and download through the JSON API, or "grpc" to
+            do so through gRPC, which requires the grpc extra of google-cloud-storage. Range
+            downloads and deletes always use the JSON API.
 
     """
 
-    def __init__(self, max_composite_object_size):
+    def __init__(
+        self,
+        max_composite_object_size,
+        max_workers=1,
+        use_batch_get=False,
+        range_chunks=8,
+        use_lifecycle_cleanup=False,
+        transport="rest",
+    ):
+        if transport not in TRANSPORTS:
+            raise ValueError(f"transport must be one of {TRANSPORTS}, got {transport}.")
         self.max_composite_object_size = max_composite_object_size
+        self.max_workers = max_workers
+        self.use_batch_get = use_batch_get
+        self.range_chunks = range_chunks
+        self.use_lifecycle_cleanup = use_lifecycle_cleanup
+        self.transport = transport
 
 
 def df_download_thread(
@@ -303,6 +861,261 @@ def dataflux_download_parallel(
         return list(itertools.chain.from_iterable(results))
 
 
+def _plan_groups(
+    objects: list[tuple[str, int]], max_composite_object_size: int
+) -> list[tuple[str, object]]:
+    """Split the objects into the download groups used by the DataFlux download algorithm.
+
+    Args:
+        objects: A list of tuples which indicate the object names and sizes (in bytes) in the bucket.
+            Example: [("object_name_A", 1000), ("object_name_B", 2000)]
+        max_composite_object_size: An integer indicating a cap for the maximum size of the composite object.
+
+    Returns:
+        A list of (kind, entry) tuples in download order. When kind is "single" the entry is the
+        object tuple to download directly; when kind is "compose" the entry is the list of object
+        tuples to compose, download and decompose.
+    """
+    plans = []
+    i = 0
+    while i < len(objects):
+        curr_object_size = objects[i][1]
+
+        if curr_object_size > max_composite_object_size:
+            plans.append(("single", objects[i]))
+            i += 1
+        else:
+            # Dynamically compose and decompose based on the object size.
+            objects_slice = []
+            curr_size = 0
+
+            # Only add the next object if the group stays within max_composite_object_size.
+            # The first object always fits, as larger objects are downloaded on their own above.
+            while (
+                i < len(objects)
+                and len(objects_slice) < MAX_NUM_OBJECTS_TO_COMPOSE
+                and curr_size + objects[i][1] <= max_composite_object_size
+            ):
+                curr_size += objects[i][1]
+                objects_slice.append(objects[i])
+                i += 1
+
+            if len(objects_slice) == 1:
+                plans.append(("single", objects_slice[0]))
+            else:
+                plans.append(("compose", objects_slice))
+    return plans
+
+
+def _pack_groups(
+    objects: list[tuple[str, int]], max_composite_object_size: int
+) -> tuple[list[tuple[str, object]], list[int]]:
+    """Pack the objects into as few download groups as possible, ignoring their input order.
+
+    Objects larger than max_composite_object_size are downloaded on their own. The remaining
+    objects are packed best-fit decreasing: largest first, each into the open group with the
+    least remaining capacity that still fits it, with at most MAX_NUM_OBJECTS_TO_COMPOSE
+    objects per group.
+
+    Args:
+        objects: A list of tuples which indicate the object names and sizes (in bytes) in the bucket.
+            Example: [("object_name_A", 1000), ("object_name_B", 2000)]
+        max_composite_object_size: An integer indicating a cap for the maximum size of the composite object.
+
+    Returns:
+        A tuple of the (kind, entry) groups, as described in _plan_groups, and the indices into
+        objects of the objects in those groups, in group order.
+    """
+    plans = []
+    order = []
+    small = []
+    for index, each_object in enumerate(objects):
+        if each_object[1] > max_composite_object_size:
+            plans.append(("single", each_object))
+            order.append(index)
+        else:
+            small.append(index)
+    small.sort(key=lambda index: -objects[index][1])
+
+    bins = []
+    # Sorted (remaining capacity, bin number) pairs of the bins that can still take objects.
+    open_bins = []
+    for index in small:
+        size = objects[index][1]
+        pos = bisect.bisect_left(open_bins, (size, -1))
+        if pos == len(open_bins):
+            bins.append([index])
+            bin_number = len(bins) - 1
+            remaining = max_composite_object_size - size
+        else:
+            remaining, bin_number = open_bins.pop(pos)
+            bins[bin_number].append(index)
+            remaining -= size
+        if len(bins[bin_number]) < MAX_NUM_OBJECTS_TO_COMPOSE:
+            bisect.insort(open_bins, (remaining, bin_number))
+
+    for indices in bins:
+        if len(indices) == 1:
+            plans.append(("single", objects[indices[0]]))
+        else:
+            plans.append(("compose", [objects[index] for index in indices]))
+        order.extend(indices)
+    return plans, order
+
+
+def _download_group(
+    project_name: str,
+    bucket_name: str,
+    group: tuple[str, object],
+    storage_client: object,
+    dataflux_download_optimization_params: DataFluxDownloadOptimizationParams,
+    delete_futures: list,
+    zero_copy: bool = False,
+    lifecycle_cleanup: bool = False,
+) -> list[bytes]:
+    """Download the contents of a single group planned by _plan_groups.
+
+    Args:
+        project_name: the name of the GCP project.
+        bucket_name: the name of the GCS bucket that holds the objects.
+        group: a (kind, entry) tuple as returned by _plan_groups.
+        storage_client: the google.cloud.storage.Client initialized with the project.
+        dataflux_download_optimization_params: the paramemters used to optimize the download performance.
+        delete_futures: a list onto which the future of the composite object delete is appended.
+        zero_copy: When true, composed objects are decomposed into memoryview slices and
+            range downloaded objects are returned as memoryviews.
+        lifecycle_cleanup: When true, the composite object is left for the bucket lifecycle
+            rule to delete, see ensure_composed_lifecycle.
+
+    Returns:
+        the contents (in bytes) of the objects in the group, in order.
+    """
+    kind, entry = group
+    transport = dataflux_download_optimization_params.transport
+    range_chunks = dataflux_download_optimization_params.range_chunks
+    if kind == "single" and entry[1] > SINGLE_STREAM_THRESHOLD and range_chunks > 1:
+        content = _parallel_range_get(
+            storage_client, bucket_name, entry[0], entry[1], range_chunks
+        )
+        return [content if zero_copy else bytes(content)]
+    if kind == "single":
+        return [
+            download_single(
+                storage_client=storage_client,
+                bucket_name=bucket_name,
+                object_name=entry[0],
+                transport=transport,
+            )
+        ]
+
+    if dataflux_download_optimization_params.use_batch_get:
+        return _batch_get(
+            storage_client,
+            bucket_name,
+            [each_object[0] for each_object in entry],
+            transport,
+        )
+
+    # If the number of objects > 1, we want to compose, download, decompose and delete the composite object.
+    # Need to create a unique composite name to avoid mutation on the same object among processes.
+    composed_object_name = _next_composite_name()
+    composed_object = compose(
+        project_name,
+        bucket_name,
+        composed_object_name,
+        entry,
+        storage_client,
+        transport,
+    )
+    if not lifecycle_cleanup:
+        current_composed_objects[composed_object_name] = composed_object
+    composed_size = sum(each_object[1] for each_object in entry)
+    if composed_size > SINGLE_STREAM_THRESHOLD and range_chunks > 1:
+        content = _parallel_range_get(
+            storage_client,
+            bucket_name,
+            composed_object_name,
+            composed_size,
+            range_chunks,
+        )
+    else:
+        content = download_single(
+            storage_client,
+            bucket_name,
+            composed_object_name,
+            size_hint=composed_size,
+            transport=transport,
+        )
+    res = decompose_bytes(content, entry, zero_copy)
+    if not lifecycle_cleanup:
+        # Delete off the critical path; callers wait on delete_futures before returning.
+        delete_futures.append(_DELETE_POOL.submit(_safe_delete, composed_object))
+    return res
+
+
+def ensure_composed_lifecycle(storage_client: object, bucket_name: str) -> bool:
+    """Make sure the bucket deletes composite objects older than a day through a lifecycle rule.
+
+    The rule is added at most once per client and bucket, and is meant to be checked once per
+    download, before its groups fan out. Composite objects left to the rule linger for up to a
+    day and incur storage cost during that time, in exchange for skipping a delete request
+    per composite object.
+
+    Args:
+        storage_client: the google.cloud.storage.Client initialized with the project.
+        bucket_name: the name of the GCS bucket that holds the composite objects.
+
+    Returns:
+        True if the lifecycle rule is in place, False if it could not be added.
+    """
+    with _COMPOSED_LIFECYCLE_LOCK:
+        checked = _COMPOSED_LIFECYCLE.setdefault(storage_client, {})
+        if bucket_name not in checked:
+            try:
+                _add_composed_lifecycle_rule(storage_client.bucket(bucket_name))
+                checked[bucket_name] = True
+            except Exception as e:
+                logging.exception(
+                    f"exception while adding the composite object lifecycle rule, falling back to deletes: {e}"
+                )
+                checked[bucket_name] = False
+        return checked[bucket_name]
+
+
+def _add_composed_lifecycle_rule(bucket: object):
+    """Add the composite object lifecycle rule to the bucket unless it is already there.
+
+    The patch only applies if the bucket metadata is unchanged since it was read, so that
+    lifecycle rules edited concurrently are not overwritten. On a conflict the bucket is
+    read again, up to _LIFECYCLE_PATCH_ATTEMPTS times.
+    """
+    for attempt in range(_LIFECYCLE_PATCH_ATTEMPTS):
+        bucket.reload(retry=MODIFIED_RETRY)
+        for rule in bucket.lifecycle_rules:
+            if rule.get("action", {}).get("type") == "Delete" and rule.get(
+                "condition", {}
+            ) == {"age": 1, "matchesPrefix": [COMPOSED_PREFIX]}:
+                return
+        bucket.add_lifecycle_delete_rule(age=1, matches_prefix=[COMPOSED_PREFIX])
+        try:
+            bucket.patch(
+                if_metageneration_match=bucket.metageneration, retry=MODIFIED_RETRY
+            )
+            return
+        except PreconditionFailed:
+            if attempt == _LIFECYCLE_PATCH_ATTEMPTS - 1:
+                raise
+
+
+def _safe_delete(composed_object):
+    """Delete the composite object, logging any failure instead of raising it."""
+    try:
+        composed_object.delete(retry=MODIFIED_RETRY)
+        current_composed_objects.pop(composed_object.name, None)
+    except Exception as e:
+        logging.exception(f"exception while deleting the composite object: {e}")
+
+
 def dataflux_download(
     project_name: str,
     bucket_name: str,
@@ -310,9 +1123,13 @@ def dataflux_download(
     storage_client: object = None,
     dataflux_download_optimization_params: DataFluxDownloadOptimizationParams = None,
     threading_enabled=False,
+    zero_copy=False,
 ) -> list[bytes]:
     """Perform the DataFlux download algorithm to download the object contents as bytes and return.
 
+    The objects are first packed into independent download groups, which are then downloaded
+    concurrently on up to dataflux_download_optimization_params.max_workers threads.
+
     Args:
         project_name: the name of the GCP project.
         bucket_name: the name of the GCS bucket that holds the objects to compose.
@@ -322,89 +1139,149 @@ def dataflux_download(
         storage_client: the google.cloud.storage.Client initialized with the project.
             If not defined, the function will initialize the client with the project_name.
         dataflux_download_optimization_params: the paramemters used to optimize the download performance.
+        zero_copy: When true, objects downloaded through a composite object are returned as
+            memoryview slices of the composite object contents rather than as bytes copies.
     Returns:
         the contents of the object in bytes.
     """
-    if storage_client is None:
-        storage_client = storage.Client(
-            project=project_name,
-            client_info=ClientInfo(user_agent="dataflux/0.0"),
-        )
+    max_workers = dataflux_download_optimization_params.max_workers
+    storage_client = storage_client or _get_client(
+        project_name, max(max_workers, DEFAULT_CONNECTION_POOL_SIZE)
+    )
 
-    res = []
-    max_composite_object_size = (
-        dataflux_download_optimization_params.max_composite_object_size
+    plans, order = _pack_groups(
+        objects, dataflux_download_optimization_params.max_composite_object_size
+    )
+    # The composite objects are left for the bucket lifecycle rule to delete, if one is in place.
+    lifecycle_cleanup = (
+        dataflux_download_optimization_params.use_lifecycle_cleanup
+        and ensure_composed_lifecycle(storage_client, bucket_name)
     )
 
-    i = 0
     # Register the cleanup signal handler for SIGINT.
     if not threading_enabled:
         signal.signal(signal.SIGINT, term_signal_handler)
-    global current_composed_object
-    while i < len(objects):
-        curr_object_name = objects[i][0]
-        curr_object_size = objects[i][1]
 
-        if curr_object_size > max_composite_object_size:
-            # Download the single object.
-            curr_object_content = download_single(
-                storage_client=storage_client,
-                bucket_name=bucket_name,
-                object_name=curr_object_name,
-            )
-            res.append(curr_object_content)
-            i += 1
-        else:
-            # Dynamically compose and decompose based on the object size.
-            objects_slice = []
-            curr_size = 0
+    group_res = [None] * len(plans)
+    delete_futures = []
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {
+            executor.submit(
+                _download_group,
+                project_name,
+                bucket_name,
+                group,
+                storage_client,
+                dataflux_download_optimization_params,
+                delete_futures,
+                zero_copy,
+                lifecycle_cleanup,
+            ): index
+            for index, group in enumerate(plans)
+        }
+        for future in as_completed(futures):
+            group_res[futures[future]] = future.result()
+    except BaseException:
+        # Drop the queued groups so that Ctrl+C (SystemExit from term_signal_handler) or a
+        # failed group stops the download instead of waiting for every remaining group.
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        executor.shutdown(wait=False)
+        wait(delete_futures)
+
+    return _restore_order(order, group_res)
+
+
+async def dataflux_download_async(
+    project_name: str,
+    bucket_name: str,
+    objects: list[tuple[str, int]],
+    storage_client: object = None,
+    dataflux_download_optimization_params: DataFluxDownloadOptimizationParams = None,
+    zero_copy=False,
+) -> list[bytes]:
+    """Perform the DataFlux download algorithm from an asyncio event loop and return the object contents.
 
-            while (
-                i < len(objects)
-                and curr_size <= max_composite_object_size
-                and len(objects_slice) < MAX_NUM_OBJECTS_TO_COMPOSE
-            ):
-                curr_size += objects[i][1]
-                objects_slice.append(objects[i])
-                i += 1
+    The groups are downloaded as in dataflux_download, on up to
+    dataflux_download_optimization_params.max_workers threads, while the event loop stays free
+    to run other tasks. No SIGINT handler is registered; cancellation is left to the caller.
 
-            if len(objects_slice) == 1:
-                object_name = objects_slice[0][0]
-                curr_object_content = download_single(
-                    storage_client=storage_client,
-                    bucket_name=bucket_name,
-                    object_name=object_name,
-                )
-                res.append(curr_object_content)
-            else:
-                # If the number of objects > 1, we want to compose, download, decompose and delete the composite object.
-                # Need to create a unique composite name to avoid mutation on the same object among processes.
-                composed_object_name = COMPOSED_PREFIX + str(uuid.uuid4())
-                composed_object = compose(
-                    project_name,
-                    bucket_name,
-                    composed_object_name,
-                    objects_slice,
-                    storage_client,
-                )
-                current_composed_object = composed_object
-                res.extend(
-                    decompose(
+    Args:
+        project_name: the name of the GCP project.
+        bucket_name: the name of the GCS bucket that holds the objects to compose.
+            The function uploads the the composed object to this bucket too.
+        objects: A list of tuples which indicate the object names and sizes (in bytes) in the bucket.
+            Example: [("object_name_A", 1000), ("object_name_B", 2000)]
+        storage_client: the google.cloud.storage.Client initialized with the project.
+            If not defined, the function will initialize the client with the project_name.
+        dataflux_download_optimization_params: the paramemters used to optimize the download performance.
+        zero_copy: see dataflux_download.
+    Returns:
+        the contents of the object in bytes.
+    """
+    max_workers = dataflux_download_optimization_params.max_workers
+    plans, order = _pack_groups(
+        objects, dataflux_download_optimization_params.max_composite_object_size
+    )
+
+    loop = asyncio.get_running_loop()
+    delete_futures = []
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        # Client creation and the lifecycle rule check block on the network, so they run
+        # on the executor too.
+        storage_client = storage_client or await loop.run_in_executor(
+            executor,
+            _get_client,
+            project_name,
+            max(max_workers, DEFAULT_CONNECTION_POOL_SIZE),
+        )
+        # The composite objects are left for the bucket lifecycle rule to delete, if one is in place.
+        lifecycle_cleanup = (
+            dataflux_download_optimization_params.use_lifecycle_cleanup
+            and await loop.run_in_executor(
+                executor, ensure_composed_lifecycle, storage_client, bucket_name
+            )
+        )
+        group_res = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    executor,
+                    functools.partial(
+                        _download_group,
                         project_name,
                         bucket_name,
-                        composed_object_name,
-                        objects_slice,
+                        group,
                         storage_client,
-                    )
+                        dataflux_download_optimization_params,
+                        delete_futures,
+                        zero_copy,
+                        lifecycle_cleanup,
+                    ),
                 )
+                for group in plans
+            )
+        )
+    except BaseException:
+        # As in dataflux_download, drop the queued groups once a group fails or the call
+        # is cancelled.
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        executor.shutdown(wait=False)
+        await asyncio.gather(
+            *(asyncio.wrap_future(future) for future in delete_futures)
+        )
+    return _restore_order(order, group_res)
 
-                try:
-                    composed_object.delete(retry=MODIFIED_RETRY)
-                    current_composed_object = None
-                except Exception as e:
-                    logging.exception(
-                        f"exception while deleting the composite object: {e}"
-                    )
+
+def _restore_order(order: list[int], group_res: list[list[bytes]]) -> list[bytes]:
+    """Put the contents of groups planned by _pack_groups back into input order."""
+    res = [None] * len(order)
+    for index, content in zip(order, itertools.chain.from_iterable(group_res)):
+        res[index] = content
     return res
 
 
@@ -430,85 +1307,34 @@ def dataflux_download_lazy(
     Returns:
         An iterator of the contents of the object in bytes.
     """
-    if storage_client is None:
-        storage_client = storage.Client(
-            project=project_name,
-            client_info=ClientInfo(user_agent="dataflux/0.0"),
-        )
+    storage_client = storage_client or _get_client(project_name)
 
-    max_composite_object_size = (
-        dataflux_download_optimization_params.max_composite_object_size
+    plans = _plan_groups(
+        objects, dataflux_download_optimization_params.max_composite_object_size
+    )
+    # The composite objects are left for the bucket lifecycle rule to delete, if one is in place.
+    lifecycle_cleanup = (
+        dataflux_download_optimization_params.use_lifecycle_cleanup
+        and ensure_composed_lifecycle(storage_client, bucket_name)
     )
 
-    i = 0
     # Register the cleanup signal handler for SIGINT.
     if not threading_enabled:
         signal.signal(signal.SIGINT, term_signal_handler)
-    global current_composed_object
-    while i < len(objects):
-        curr_object_name = objects[i][0]
-        curr_object_size = objects[i][1]
-
-        if curr_object_size > max_composite_object_size:
-            # Download the single object.
-            curr_object_content = download_single(
-                storage_client=storage_client,
-                bucket_name=bucket_name,
-                object_name=curr_object_name,
+    delete_futures = []
+    try:
+        for group in plans:
+            yield from _download_group(
+                project_name,
+                bucket_name,
+                group,
+                storage_client,
+                dataflux_download_optimization_params,
+                delete_futures,
+                lifecycle_cleanup=lifecycle_cleanup,
             )
-            yield from [curr_object_content]
-            i += 1
-        else:
-            # Dynamically compose and decompose based on the object size.
-            objects_slice = []
-            curr_size = 0
-
-            while (
-                i < len(objects)
-                and curr_size <= max_composite_object_size
-                and len(objects_slice) < MAX_NUM_OBJECTS_TO_COMPOSE
-            ):
-                curr_size += objects[i][1]
-                objects_slice.append(objects[i])
-                i += 1
-
-            if len(objects_slice) == 1:
-                object_name = objects_slice[0][0]
-                curr_object_content = download_single(
-                    storage_client=storage_client,
-                    bucket_name=bucket_name,
-                    object_name=object_name,
-                )
-                yield from [curr_object_content]
-            else:
-                # If the number of objects > 1, we want to compose, download, decompose and delete the composite object.
-                # Need to create a unique composite name to avoid mutation on the same object among processes.
-                composed_object_name = COMPOSED_PREFIX + str(uuid.uuid4())
-                composed_object = compose(
-                    project_name,
-                    bucket_name,
-                    composed_object_name,
-                    objects_slice,
-                    storage_client,
-                )
-                current_composed_object = composed_object
-                yield from (
-                    decompose(
-                        project_name,
-                        bucket_name,
-                        composed_object_name,
-                        objects_slice,
-                        storage_client,
-                    )
-                )
-
-                try:
-                    composed_object.delete(retry=MODIFIED_RETRY)
-                    current_composed_object = None
-                except Exception as e:
-                    logging.exception(
-                        f"exception while deleting the composite object: {e}"
-                    )
+    finally:
+        wait(delete_futures)
 
 
 def clean_composed_object(composed_object):
@@ -521,5 +1347,6 @@ def clean_composed_object(composed_object):
 
 def term_signal_handler(signal_num, frame):
     print("Ctrl+C interrupt detected. Cleaning up and exiting...")
-    clean_composed_object(current_composed_object)
+    for composed_object in list(current_composed_objects.values()):
+        clean_composed_object(composed_object)
     sys.exit(0)
@@ -22,6 +22,7 @@ from dataflux_core import range_splitter
 from dataflux_core.download import COMPOSED_PREFIX
 import logging
 import time
+from typing import Callable
 
 from google.cloud import storage
 from google.api_core.client_info import ClientInfo
@@ -400,6 +401,7 @@ class ListingController(object):
         results_queue: "multiprocessing.Queue[set[tuple[str, int]]]",
         metadata_queue: "multiprocessing.Queue[tuple[str, int]]",
         results: "set[tuple[str, int]]",
+        on_batch: "Callable[[set[tuple[str, int]]], None]" = None,
     ) -> list[tuple[str, int]]:
         """Allows processes to shut down, kills procs that failed to initialize.
 
@@ -408,6 +410,8 @@ class ListingController(object):
           results_queue: the queue for transmitting all result tuples from listing.
           metadata_queue: the queue for transmitting all tracking metadata from workers.
           results: the set of unique results consumed from results_queue.
+          on_batch: when provided, called with each batch consumed from results_queue
+            instead of adding the batch to results.
 
         Returns:
           A sorted list of (str, int) tuples indicating the name and file size of each
@@ -425,8 +429,7 @@ class ListingController(object):
                     while True:
                         try:
                             result = results_queue.get_nowait()
-                            results.update(result)
-                            logging.debug(f"Result count: {len(results)}")
+                            self.add_results(results, result, on_batch)
                         except queue.Empty:
                             break
                     time.sleep(0.2)
@@ -454,6 +457,25 @@ class ListingController(object):
                     return sorted(results)
                 return list(results)
 
+    def add_results(
+        self,
+        results: "set[tuple[str, int]]",
+        batch: "set[tuple[str, int]]",
+        on_batch: "Callable[[set[tuple[str, int]]], None]" = None,
+    ) -> None:
+        """Adds a batch of listing results to the result set, or hands it to on_batch.
+
+        Args:
+          results: the set of unique results consumed so far.
+          batch: the batch of results consumed from the results queue.
+          on_batch: when provided, called with the batch instead of adding it to results.
+        """
+        if on_batch is not None:
+            on_batch(batch)
+            return
+        results.update(batch)
+        logging.debug(f"Result count: {len(results)}")
+
     def terminate_now(self, processes: "list[multiprocessing.Process]") -> RuntimeError:
         """Terminates all processes immediately.
 
@@ -468,12 +490,19 @@ class ListingController(object):
             p.terminate()
         raise RuntimeError("multiprocessing child process became unresponsive; check logs for underlying error")
 
-    def run(self) -> list[tuple[str, int]]:
+    def run(
+        self, on_batch: "Callable[[set[tuple[str, int]]], None]" = None
+    ) -> list[tuple[str, int]]:
         """Runs the controller that manages fast listing.
 
+        Args:
+          on_batch: when provided, called with each batch of (str, int) tuples as it arrives
+            from a worker, instead of collecting all results in memory. Batches are
+            deduplicated within a worker but not across workers.
+
         Returns:
           A sorted list of (str, int) tuples indicating the name and file size of each
-          unique file listed in the listing process.
+          unique file listed in the listing process. Empty when on_batch is provided.
         """
         # Define the queues.
         send_work_stealing_needed_queue: multiprocessing.Queue[str] = (
@@ -533,8 +562,7 @@ class ListingController(object):
                 except queue.Empty:
                     break
             if len(new_results) > 0:
-                results.update(new_results)
-                logging.debug(f"Result count: {len(results)}")
+                self.add_results(results, new_results, on_batch)
             if not alive:
                 break
             # Update all queues related to tracking process status.
@@ -553,9 +581,10 @@ class ListingController(object):
         while True:
             try:
                 result = results_queue.get_nowait()
-                results.update(result)
-                logging.debug(f"Result count: {len(results)}")
+                self.add_results(results, result, on_batch)
             except queue.Empty:
                 break
         logging.debug("Got all results, waiting for processes to exit.")
-        return self.cleanup_processes(processes, results_queue, metadata_queue, results)
+        return self.cleanup_processes(
+            processes, results_queue, metadata_queue, results, on_batch
+        )
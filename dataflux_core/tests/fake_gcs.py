@@ -22,7 +22,9 @@ server, which could be a future improvement.
 """
 
 from __future__ import annotations
+import gzip
 import io
+from google.api_core.exceptions import NotFound, PreconditionFailed, ServiceUnavailable
 
 class Bucket(object):
     """Bucket represents a bucket in GCS, containing objects."""
@@ -32,6 +34,9 @@ class Bucket(object):
             raise Exception("bucket name must not be empty")
         self.name = name
         self.blobs: dict[str, Blob] = dict()
+        self.lifecycle_rules: list[dict] = list()
+        self.patch_count = 0
+        self.metageneration = 1
 
     def list_blobs(
         self,
@@ -51,11 +56,36 @@ class Bucket(object):
                     results.append(self.blobs[name])
         return results
 
-    def blob(self, name: str):
+    def blob(self, name: str, generation: int = None):
         if name not in self.blobs:
             self.blobs[name] = Blob(name, bucket=self)
         return self.blobs[name]
 
+    def get_blob(self, name: str, retry=None):
+        return self.blobs.get(name)
+
+    def reload(self, retry=None):
+        pass
+
+    def add_lifecycle_delete_rule(self, **kw):
+        condition = {}
+        if "age" in kw:
+            condition["age"] = kw["age"]
+        if "matches_prefix" in kw:
+            condition["matchesPrefix"] = kw["matches_prefix"]
+        self.lifecycle_rules.append(
+            {"action": {"type": "Delete"}, "condition": condition}
+        )
+
+    def patch(self, if_metageneration_match=None, retry=None):
+        if (
+            if_metageneration_match is not None
+            and if_metageneration_match != self.metageneration
+        ):
+            raise PreconditionFailed("metageneration does not match")
+        self.patch_count += 1
+        self.metageneration += 1
+
     def _add_file(self, filename: str, content: bytes, storage_class="STANDARD"):
         self.blobs[filename] = Blob(
             filename, content, self, storage_class=storage_class
@@ -83,6 +113,9 @@ class Blob(object):
         content: The byte content of the Blob.
         bucket: The bucket object in which this Blob resides.
         size: The size in bytes of the Blob.
+        generation: The generation of the Blob.
+        content_encoding: The Content-Encoding of the Blob. When "gzip", raw downloads
+            return the gzip-compressed content.
     """
 
     def __init__(
@@ -96,8 +129,13 @@ class Blob(object):
         self.retry = None
         self.content = content
         self.bucket = bucket
-        self.size = len(self.content)
         self.storage_class = storage_class
+        self.generation = 1
+        self.content_encoding = None
+
+    @property
+    def size(self) -> int:
+        return len(self.content)
 
     def compose(self, sources: list[str], retry=None):
         b = b""
@@ -112,6 +150,16 @@ class Blob(object):
     def download_as_bytes(self, retry=None):
         return self.content
 
+    def download_to_file(
+        self, file_obj, start=None, end=None, raw_download=False, retry=None
+    ):
+        content = self.content
+        if raw_download and self.content_encoding == "gzip":
+            content = gzip.compress(content)
+        start = start or 0
+        end = len(content) if end is None else end + 1
+        file_obj.write(content[start:end])
+
     def open(self, mode: str, ignore_flush: bool = False):
         if mode == "rb":
             return io.BytesIO(self.content)
@@ -135,3 +183,60 @@ class Client(object):
             if name in self.content:
                 self.buckets[name].content = self.content[name]
         return self.buckets[name]
+
+
+class GrpcClient(object):
+    """GrpcClient represents a gRPC storage client backed by the buckets of a Client.
+
+    Attributes:
+        client: The Client holding the buckets.
+        chunk_size: The number of bytes in each ReadObject response.
+        fail_after: When set, the next ReadObject stream breaks off with ServiceUnavailable
+            after this many responses.
+        corrupt_chunk: When set, the response with this index in the next ReadObject stream
+            carries a wrong crc32c.
+        read_requests: The ReadObject requests received.
+    """
+
+    def __init__(self, client: Client, chunk_size: int = 4):
+        self.client = client
+        self.chunk_size = chunk_size
+        self.fail_after = None
+        self.corrupt_chunk = None
+        self.read_requests = []
+
+    def _bucket(self, path: str) -> Bucket:
+        return self.client.bucket(path.split("/")[-1])
+
+    def read_object(self, request, retry=None):
+        import google_crc32c
+        from google.cloud import _storage_v2 as storage_v2
+
+        self.read_requests.append(request)
+        blob = self._bucket(request.bucket).blobs[request.object_]
+        if request.generation and request.generation != blob.generation:
+            raise NotFound("generation does not match")
+        content = blob.content[request.read_offset :]
+        fail_after, self.fail_after = self.fail_after, None
+        corrupt_chunk, self.corrupt_chunk = self.corrupt_chunk, None
+        for n, i in enumerate(range(0, max(len(content), 1), self.chunk_size)):
+            if n == fail_after:
+                raise ServiceUnavailable("stream broke off")
+            chunk = content[i : i + self.chunk_size]
+            crc32c = google_crc32c.value(chunk) ^ (1 if n == corrupt_chunk else 0)
+            response = storage_v2.ReadObjectResponse(
+                checksummed_data=storage_v2.ChecksummedData(content=chunk, crc32c=crc32c)
+            )
+            # Only the first response of a stream carries the object metadata.
+            if n == 0:
+                response.metadata = storage_v2.Object(generation=blob.generation)
+                response.object_checksums = storage_v2.ObjectChecksums(
+                    crc32c=google_crc32c.value(blob.content)
+                )
+            yield response
+
+    def compose_object(self, request, retry=None):
+        bucket = self._bucket(request.destination.bucket)
+        bucket.blob(request.destination.name).content = b"".join(
+            bucket.blobs[source.name].content for source in request.source_objects
+        )
@@ -14,11 +14,26 @@
  limitations under the License.
  """
 
+import asyncio
+import gc
+import importlib.util
+import os
+import signal
+import threading
+import time
 import unittest
+import uuid
+import weakref
+import requests
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import storage
+from google.cloud.storage.exceptions import DataCorruption
 from dataflux_core.tests import fake_gcs
 from dataflux_core import download
 from unittest import mock
 
+HAS_GRPC = importlib.util.find_spec("grpc") is not None
+
 
 class DownloadTestCase(unittest.TestCase):
     def test_compose(self):
@@ -35,6 +50,24 @@ class DownloadTestCase(unittest.TestCase):
         self.assertEqual(blob.name, destination_blob_name)
         self.assertEqual(blob.content, expected_result)
 
+    def test_compose_more_than_max_objects(self):
+        bucket_name = "test_bucket"
+        destination_blob_name = "dest_name"
+        num_objects = download.MAX_NUM_OBJECTS_TO_COMPOSE * 2 + 1
+        objects = [(f"obj{i}", len(f"obj{i}")) for i in range(num_objects)]
+        client = fake_gcs.Client()
+        bucket = client.bucket(bucket_name)
+        for name, _ in objects:
+            bucket._add_file(name, bytes(name, "utf-8"))
+        expected_result = b"".join(bytes(name, "utf-8") for name, _ in objects)
+        blob = download.compose("", bucket_name, destination_blob_name, objects, client)
+        self.assertEqual(blob.content, expected_result)
+        # This checks for succesful deletion of the intermediate composed objects.
+        if len(bucket.blobs) != num_objects + 1:
+            self.fail(
+                f"expected only {num_objects + 1} objects in bucket, but found {len(bucket.blobs)}"
+            )
+
     def test_decompose(self):
         bucket_name = "test_bucket"
         object_name = "test_obj"
@@ -45,6 +78,56 @@ class DownloadTestCase(unittest.TestCase):
         result = download.decompose("", bucket_name, object_name, objects, client)
         self.assertEqual(result, [b"one", b"two", b"three"])
 
+    def test_decompose_zero_copy(self):
+        bucket_name = "test_bucket"
+        object_name = "test_obj"
+        objects = [("one", 3), ("two", 3), ("three", 5)]
+        client = fake_gcs.Client()
+        bucket = client.bucket(bucket_name)
+        bucket._add_file(object_name, bytes("onetwothree", "utf-8"))
+        result = download.decompose(
+            "", bucket_name, object_name, objects, client, zero_copy=True
+        )
+        for content in result:
+            self.assertIsInstance(content, memoryview)
+        self.assertEqual([bytes(c) for c in result], [b"one", b"two", b"three"])
+
+    def test_decompose_bytes(self):
+        objects = [("one", 3), ("two", 3), ("three", 5)]
+        content = bytes("onetwothree", "utf-8")
+        self.assertEqual(
+            download.decompose_bytes(content, objects), [b"one", b"two", b"three"]
+        )
+        self.assertEqual(
+            download.decompose_bytes(bytearray(content), objects, zero_copy=True),
+            [b"one", b"two", b"three"],
+        )
+
+    @mock.patch("dataflux_core.download.SINGLE_STREAM_THRESHOLD", 4)
+    def test_dataflux_download_range_composite(self):
+        bucket_name = "test_bucket"
+        objects = [("one", 3), ("two", 3), ("three", 5)]
+        client = fake_gcs.Client()
+        bucket = client.bucket(bucket_name)
+        bucket._add_file("one", bytes("one", "utf-8"))
+        bucket._add_file("two", bytes("two", "utf-8"))
+        bucket._add_file("three", bytes("three", "utf-8"))
+        params = download.DataFluxDownloadOptimizationParams(32, range_chunks=2)
+        expected_result = [b"one", b"two", b"three"]
+        with mock.patch.object(
+            download, "_parallel_range_get", wraps=download._parallel_range_get
+        ) as range_get:
+            result = download.dataflux_download(
+                "", bucket_name, objects, client, params
+            )
+        self.assertEqual(result, expected_result)
+        range_get.assert_called_once_with(client, bucket_name, mock.ANY, 11, 2)
+        # This checks for succesful deletion of the composed object.
+        if len(bucket.blobs) != 3:
+            self.fail(
+                f"expected only 3 objects in bucket, but found {len(bucket.blobs)}"
+            )
+
     def test_download_single(self):
         client = fake_gcs.Client()
         bucket_name = "test_bucket"
@@ -55,6 +138,108 @@ class DownloadTestCase(unittest.TestCase):
         result = download.download_single(client, bucket_name, object_name)
         self.assertEqual(result, content)
 
+    def test_download_single_size_hint(self):
+        test_cases = [
+            {"desc": "exact size hint", "size_hint": 11},
+            {"desc": "size hint too small", "size_hint": 4},
+            {"desc": "size hint too large", "size_hint": 20},
+        ]
+        client = fake_gcs.Client()
+        bucket_name = "test_bucket"
+        object_name = "test_obj"
+        content = bytes("onetwothree", "utf-8")
+        bucket = client.bucket(bucket_name)
+        bucket._add_file(object_name, content)
+        for tc in test_cases:
+            result = download.download_single(
+                client, bucket_name, object_name, size_hint=tc["size_hint"]
+            )
+            self.assertIsInstance(result, memoryview, tc["desc"])
+            self.assertEqual(bytes(result), content, tc["desc"])
+
+    def test_parallel_range_get(self):
+        test_cases = [
+            {"desc": "even split", "chunks": 2},
+            {"desc": "last chunk absorbs remainder", "chunks": 3},
+            {"desc": "single chunk", "chunks": 1},
+        ]
+        client = fake_gcs.Client()
+        bucket_name = "test_bucket"
+        object_name = "test_obj"
+        content = bytes("onetwothreefour", "utf-8")
+        bucket = client.bucket(bucket_name)
+        bucket._add_file(object_name, content)
+        for tc in test_cases:
+            result = download._parallel_range_get(
+                client, bucket_name, object_name, len(content), tc["chunks"]
+            )
+            self.assertEqual(bytes(result), content, tc["desc"])
+
+    def test_parallel_range_get_pins_generation(self):
+        client = fake_gcs.Client()
+        bucket_name = "test_bucket"
+        object_name = "test_obj"
+        content = bytes("onetwothreefour", "utf-8")
+        bucket = client.bucket(bucket_name)
+        bucket._add_file(object_name, content)
+        bucket.blobs[object_name].generation = 7
+        with mock.patch.object(bucket, "blob", wraps=bucket.blob) as blob:
+            result = download._parallel_range_get(
+                client, bucket_name, object_name, len(content), 2
+            )
+        self.assertEqual(bytes(result), content)
+        blob.assert_called_once_with(object_name, generation=7)
+
+    def test_parallel_range_get_gzip(self):
+        client = fake_gcs.Client()
+        bucket_name = "test_bucket"
+        object_name = "test_obj"
+        content = bytes("onetwothreefour", "utf-8")
+        bucket = client.bucket(bucket_name)
+        bucket._add_file(object_name, content)
+        bucket.blobs[object_name].content_encoding = "gzip"
+        result = download._parallel_range_get(
+            client, bucket_name, object_name, len(content), 2
+        )
+        self.assertEqual(bytes(result), content)
+
+    @mock.patch("dataflux_core.download.SINGLE_STREAM_THRESHOLD", 4)
+    def test_dataflux_download_range_chunks(self):
+        bucket_name = "test_bucket"
+        objects = [("one", 3), ("two", 3), ("three", 5)]
+        client = fake_gcs.Client()
+        bucket = client.bucket(bucket_name)
+        bucket._add_file("one", bytes("one", "utf-8"))
+        bucket._add_file("two", bytes("two", "utf-8"))
+        bucket._add_file("three", bytes("three", "utf-8"))
+        params = download.DataFluxDownloadOptimizationParams(4, range_chunks=2)
+        expected_result = [b"one", b"two", b"three"]
+        with mock.patch.object(
+            download, "_parallel_range_get", wraps=download._parallel_range_get
+        ) as range_get:
+            result = download.dataflux_download(
+                "", bucket_name, objects, client, params
+            )
+        self.assertEqual(result, expected_result)
+        self.assertIsInstance(result[2], bytes)
+        range_get.assert_called_once_with(client, bucket_name, "three", 5, 2)
+
+    @mock.patch("dataflux_core.download.SINGLE_STREAM_THRESHOLD", 4)
+    def test_dataflux_download_range_stale_size(self):
+        bucket_name = "test_bucket"
+        content = bytes("onetwothreefour", "utf-8")
+        client = fake_gcs.Client()
+        bucket = client.bucket(bucket_name)
+        bucket._add_file("obj", content)
+        params = download.DataFluxDownloadOptimizationParams(0, range_chunks=3)
+        # The listed size is smaller, then larger, than the object in the bucket.
+        for listed_size in (10, 20):
+            with self.assertLogs(level="ERROR"):
+                result = download.dataflux_download(
+                    "", bucket_name, [("obj", listed_size)], client, params
+                )
+            self.assertEqual(result, [content], listed_size)
+
     def test_dataflux_download(self):
         bucket_name = "test_bucket"
         objects = [("one", 3), ("two", 3), ("three", 5)]
@@ -73,6 +258,441 @@ class DownloadTestCase(unittest.TestCase):
                 f"expected only 3 objects in bucket, but found {len(bucket.blobs)}"
             )
 
+    def test_dataflux_download_max_workers(self):
+        bucket_name = "test_bucket"
+        objects = [("one", 3), ("two", 3), ("three", 5), ("four", 4), ("five", 4)]
+        client = fake_gcs.Client()
+        bucket = client.bucket(bucket_name)
+        for name, _ in objects:
+            bucket._add_file(name, bytes(name, "utf-8"))
+        params = download.DataFluxDownloadOptimizationParams(5, max_workers=4)
+        expected_result = [b"one", b"two", b"three", b"four", b"five"]
+        result = download.dataflux_download("", bucket_name, objects, client, params)
+        self.assertEqual(result, expected_result)
+        # This checks for succesful deletion of the composed objects.
+        if len(bucket.blobs) != 5:
+            self.fail(
+                f"expected only 5 objects in bucket, but found {len(bucket.blobs)}"
+            )
+
+    def test_dataflux_download_sigint_stops_remaining_groups(self):
+        bucket_name = "test_bucket"
+        objects = [(f"object{i}", 1) for i in range(20)]
+        client = fake_gcs.Client()
+        bucket = client.bucket(bucket_name)
+        for name, _ in objects:
+            bucket._add_file(name, bytes("a", "utf-8"))
+        # A cap of 0 downloads every object as its own group.
+        params = download.DataFluxDownloadOptimizationParams(0)
+        downloaded = []
+
+        def slow_download_single(*args, **kwargs):
+            time.sleep(0.2)
+            downloaded.append(kwargs["object_name"])
+            return b"a"
+
+        previous_handler = signal.getsignal(signal.SIGINT)
+        timer = threading.Timer(0.3, os.kill, (os.getpid(), signal.SIGINT))
+        try:
+            with mock.patch.object(
+                download, "download_single", side_effect=slow_download_single
+            ):
+                timer.start()
+                with self.assertRaises(SystemExit):
+                    download.dataflux_download("", bucket_name, objects, client, params)
+                # Give any group that was wrongly left queued time to run.
+                time.sleep(0.5)
+        finally:
+            timer.cancel()
+            signal.signal(signal.SIGINT, previous_handler)
+        if len(downloaded) > 3:
+            self.fail(
+                f"expected the download to stop after SIGINT, but {len(downloaded)} objects were downloaded"
+            )
+
+    def test_dataflux_download_use_batch_get(self):
+        bucket_name = "test_bucket"
+        objects = [("one", 3), ("two", 3), ("three", 5)]
+        client = fake_gcs.Client()
+        bucket = client.bucket(bucket_name)
+        bucket._add_file("one", bytes("one", "utf-8"))
+        bucket._add_file("two", bytes("two", "utf-8"))
+        bucket._add_file("three", bytes("three", "utf-8"))
+        params = download.DataFluxDownloadOptimizationParams(32, use_batch_get=True)
+        expected_result = [b"one", b"two", b"three"]
+        with mock.patch.object(download, "compose") as compose:
+            result = download.dataflux_download(
+                "", bucket_name, objects, client, params
+            )
+        self.assertEqual(result, expected_result)
+        compose.assert_not_called()
+
+    def test_batch_get_bounded_by_connection_pool(self):
+        bucket_name = "test_bucket"
+        names = [f"object{i}" for i in range(20)]
+        client = fake_gcs.Client()
+        client._http = requests.Session()
+        client._http.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=3))
+        lock = threading.Lock()
+        in_flight = [0]
+        max_in_flight = [0]
+
+        def slow_download_single(*args, **kwargs):
+            with lock:
+                in_flight[0] += 1
+                max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+            return b"a"
+
+        with mock.patch.object(
+            download, "download_single", side_effect=slow_download_single
+        ):
+            result = download._batch_get(client, bucket_name, names)
+        self.assertEqual(result, [b"a"] * len(names))
+        self.assertEqual(max_in_flight[0], 3)
+
+    def test_dataflux_download_use_lifecycle_cleanup(self):
+        bucket_name = "test_bucket"
+        objects = [("one", 3), ("two", 3), ("three", 5)]
+        client = fake_gcs.Client()
+        bucket = client.bucket(bucket_name)
+        bucket._add_file("one", bytes("one", "utf-8"))
+        bucket._add_file("two", bytes("two", "utf-8"))
+        bucket._add_file("three", bytes("three", "utf-8"))
+        params = download.DataFluxDownloadOptimizationParams(
+            32, use_lifecycle_cleanup=True
+        )
+        expected_result = [b"one", b"two", b"three"]
+        result = download.dataflux_download("", bucket_name, objects, client, params)
+        self.assertEqual(result, expected_result)
+        # The composed object is left for the lifecycle rule to delete.
+        if len(bucket.blobs) != 4:
+            self.fail(f"expected 4 objects in bucket, but found {len(bucket.blobs)}")
+        self.assertEqual(
+            bucket.lifecycle_rules,
+            [
+                {
+                    "action": {"type": "Delete"},
+                    "condition": {
+                        "age": 1,
+                        "matchesPrefix": [download.COMPOSED_PREFIX],
+                    },
+                }
+            ],
+        )
+
+    def test_ensure_composed_lifecycle(self):
+        bucket_name = "test_bucket"
+        client = fake_gcs.Client()
+        bucket = client.bucket(bucket_name)
+        self.assertTrue(download.ensure_composed_lifecycle(client, bucket_name))
+        self.assertTrue(download.ensure_composed_lifecycle(client, bucket_name))
+        self.assertEqual(bucket.patch_count, 1)
+        # A rule added by an earlier process is not added again.
+        other_client = fake_gcs.Client()
+        other_client.buckets[bucket_name] = bucket
+        self.assertTrue(download.ensure_composed_lifecycle(other_client, bucket_name))
+        self.assertEqual(bucket.patch_count, 1)
+        self.assertEqual(len(bucket.lifecycle_rules), 1)
+
+    def test_ensure_composed_lifecycle_concurrent(self):
+        bucket_name = "test_bucket"
+        client = fake_gcs.Client()
+        bucket = client.bucket(bucket_name)
+        real_reload = bucket.reload
+
+        def slow_reload(retry=None):
+            time.sleep(0.01)
+            real_reload(retry)
+
+        with mock.patch.object(bucket, "reload", side_effect=slow_reload):
+            threads = [
+                threading.Thread(
+                    target=download.ensure_composed_lifecycle,
+                    args=(client, bucket_name),
+                )
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(bucket.patch_count, 1)
+        self.assertEqual(len(bucket.lifecycle_rules), 1)
+        # The outcome is kept by the module rather than on the client.
+        self.assertNotIn("_dataflux_composed_lifecycle", client.__dict__)
+
+    def test_ensure_composed_lifecycle_does_not_keep_client_alive(self):
+        bucket_name = "test_bucket"
+        client = fake_gcs.Client()
+        self.assertTrue(download.ensure_composed_lifecycle(client, bucket_name))
+        client_ref = weakref.ref(client)
+        del client
+        gc.collect()
+        self.assertIsNone(client_ref())
+
+    def test_ensure_composed_lifecycle_metageneration_conflict(self):
+        bucket_name = "test_bucket"
+        client = fake_gcs.Client()
+        bucket = client.bucket(bucket_name)
+        real_patch = bucket.patch
+        preconditions = []
+
+        def patch_after_concurrent_edit(**kwargs):
+            preconditions.append(kwargs["if_metageneration_match"])
+            if len(preconditions) == 1:
+                # Another writer replaces the rules between our read and our patch.
+                bucket.lifecycle_rules = []
+                bucket.metageneration += 1
+            real_patch(**kwargs)
+
+        with mock.patch.object(
+            bucket, "patch", side_effect=patch_after_concurrent_edit
+        ):
+            self.assertTrue(download.ensure_composed_lifecycle(client, bucket_name))
+        self.assertEqual(preconditions, [1, 2])
+        self.assertEqual(bucket.patch_count, 1)
+        self.assertEqual(len(bucket.lifecycle_rules), 1)
+
+    def test_dataflux_download_checks_lifecycle_once(self):
+        bucket_name = "test_bucket"
+        objects = [("one", 3), ("two", 3), ("three", 5), ("four", 4)]
+        client = fake_gcs.Client()
+        bucket = client.bucket(bucket_name)
+        for name, _ in objects:
+            bucket._add_file(name, bytes(name, "utf-8"))
+        params = download.DataFluxDownloadOptimizationParams(
+            6, max_workers=2, use_lifecycle_cleanup=True
+        )
+        with mock.patch.object(
+            download, "ensure_composed_lifecycle", return_value=True
+        ) as ensure:
+            download.dataflux_download("", bucket_name, objects, client, params)
+        ensure.assert_called_once_with(client, bucket_name)
+
+    @unittest.skipUnless(HAS_GRPC, "requires google-cloud-storage[grpc]")
+    def test_dataflux_download_grpc(self):
+        bucket_name = "test_bucket"
+        objects = [("one", 3), ("two", 3), ("three", 5), ("four", 4)]
+        client = fake_gcs.Client()
+        bucket = client.bucket(bucket_name)
+        for name, _ in objects:
+            bucket._add_file(name, bytes(name, "utf-8"))
+        params = download.DataFluxDownloadOptimizationParams(10, transport="grpc")
+        expected_result = [b"one", b"two", b"three", b"four"]
+        with mock.patch.object(
+            download, "_get_grpc_client", return_value=fake_gcs.GrpcClient(client)
+        ):
+            result = download.dataflux_download(
+                "", bucket_name, objects, client, params
+            )
+        self.assertEqual(result, expected_result)
+        # This checks for succesful deletion of the composed object.
+        if len(bucket.blobs) != 4:
+            self.fail(
+                f"expected only 4 objects in bucket, but found {len(bucket.blobs)}"
+            )
+
+    @unittest.skipUnless(HAS_GRPC, "requires google-cloud-storage[grpc]")
+    @mock.patch(
+        "dataflux_core.download.MODIFIED_RETRY",
+        download.MODIFIED_RETRY.with_delay(initial=0.01, maximum=0.01),
+    )
+    def test_grpc_download_resumes(self):
+        bucket_name = "test_bucket"
+        content = bytes("onetwothreefour", "utf-8")
+        client = fake_gcs.Client()
+        bucket = client.bucket(bucket_name)
+        bucket._add_file("obj", content)
+        bucket.blobs["obj"].generation = 7
+        grpc_client = fake_gcs.GrpcClient(client)
+        for size_hint in (None, len(content)):
+            grpc_client.fail_after = 2
+            grpc_client.read_requests = []
+            result = download._grpc_download(grpc_client, bucket_name, "obj", size_hint)
+            self.assertEqual(bytes(result), content)
+            # The second request picks up after the two chunks already received.
+            self.assertEqual(
+                [
+                    (request.read_offset, request.generation)
+                    for request in grpc_client.read_requests
+                ],
+                [(0, 0), (8, 7)],
+            )
+
+    @unittest.skipUnless(HAS_GRPC, "requires google-cloud-storage[grpc]")
+    def test_grpc_download_crc32c_mismatch(self):
+        bucket_name = "test_bucket"
+        client = fake_gcs.Client()
+        bucket = client.bucket(bucket_name)
+        bucket._add_file("obj", bytes("onetwothreefour", "utf-8"))
+        grpc_client = fake_gcs.GrpcClient(client)
+        grpc_client.corrupt_chunk = 1
+        with self.assertRaises(DataCorruption):
+            download._grpc_download(grpc_client, bucket_name, "obj")
+
+    def test_get_grpc_client_uses_client_credentials(self):
+        client = fake_gcs.Client()
+        client._credentials = object()
+        channel = object()
+        transport_class = mock.MagicMock()
+        transport_class.create_channel.return_value = channel
+        storage_v2 = mock.MagicMock()
+        storage_v2.services.storage.transports.StorageGrpcTransport = transport_class
+        with mock.patch.dict(download._GRPC_CLIENTS, clear=True), mock.patch(
+            "google.cloud._storage_v2", storage_v2, create=True
+        ):
+            grpc_client = download._get_grpc_client(client)
+            self.assertIs(download._get_grpc_client(client), grpc_client)
+        transport_class.create_channel.assert_called_once()
+        self.assertIs(
+            transport_class.create_channel.call_args.kwargs["credentials"],
+            client._credentials,
+        )
+        transport_class.assert_called_once_with(channel=channel)
+
+    def test_get_grpc_client_evicts_and_closes(self):
+        storage_v2 = mock.MagicMock()
+        storage_v2.StorageClient.side_effect = lambda transport: mock.Mock()
+        clients = [fake_gcs.Client() for _ in range(3)]
+        for client in clients:
+            client._credentials = object()
+        with mock.patch.dict(download._GRPC_CLIENTS, clear=True), mock.patch.object(
+            download, "_GRPC_CLIENTS_SIZE", 2
+        ), mock.patch("google.cloud._storage_v2", storage_v2, create=True):
+            first = download._get_grpc_client(clients[0])
+            second = download._get_grpc_client(clients[1])
+            # Using the first client again makes the second the least recently used.
+            self.assertIs(download._get_grpc_client(clients[0]), first)
+            download._get_grpc_client(clients[2])
+            self.assertEqual(len(download._GRPC_CLIENTS), 2)
+            self.assertNotIn(clients[1]._credentials, download._GRPC_CLIENTS)
+        second.transport.close.assert_called_once_with()
+        first.transport.close.assert_not_called()
+
+    def test_invalid_transport(self):
+        with self.assertRaises(ValueError):
+            download.DataFluxDownloadOptimizationParams(10, transport="http3")
+
+    def test_dataflux_download_async(self):
+        bucket_name = "test_bucket"
+        objects = [("one", 3), ("two", 3), ("three", 5), ("four", 4)]
+        client = fake_gcs.Client()
+        bucket = client.bucket(bucket_name)
+        for name, _ in objects:
+            bucket._add_file(name, bytes(name, "utf-8"))
+        params = download.DataFluxDownloadOptimizationParams(6, max_workers=2)
+        expected_result = [b"one", b"two", b"three", b"four"]
+        result = asyncio.run(
+            download.dataflux_download_async("", bucket_name, objects, client, params)
+        )
+        self.assertEqual(result, expected_result)
+        # This checks for succesful deletion of the composed object.
+        if len(bucket.blobs) != 4:
+            self.fail(
+                f"expected only 4 objects in bucket, but found {len(bucket.blobs)}"
+            )
+
+    def test_dataflux_download_async_failure_stops_remaining_groups(self):
+        bucket_name = "test_bucket"
+        objects = [(f"object{i}", 1) for i in range(20)]
+        client = fake_gcs.Client()
+        params = download.DataFluxDownloadOptimizationParams(0)
+        downloaded = []
+
+        def failing_download_single(*args, **kwargs):
+            time.sleep(0.05)
+            if kwargs["object_name"] == "object0":
+                raise RuntimeError("download failed")
+            downloaded.append(kwargs["object_name"])
+            return b"a"
+
+        with mock.patch.object(
+            download, "download_single", side_effect=failing_download_single
+        ):
+            with self.assertRaises(RuntimeError):
+                asyncio.run(
+                    download.dataflux_download_async(
+                        "", bucket_name, objects, client, params
+                    )
+                )
+            # Give any group that was wrongly left queued time to run.
+            time.sleep(0.3)
+        if len(downloaded) > 2:
+            self.fail(
+                f"expected the download to stop after the failure, but {len(downloaded)} objects were downloaded"
+            )
+
+    def test_dataflux_download_async_blocking_calls_off_loop(self):
+        bucket_name = "test_bucket"
+        objects = [("one", 3), ("two", 3)]
+        client = fake_gcs.Client()
+        bucket = client.bucket(bucket_name)
+        for name, _ in objects:
+            bucket._add_file(name, bytes(name, "utf-8"))
+        params = download.DataFluxDownloadOptimizationParams(
+            6, use_lifecycle_cleanup=True
+        )
+        threads = []
+
+        def record_thread(*args):
+            threads.append(threading.current_thread())
+            return client if len(threads) == 1 else True
+
+        with mock.patch.object(
+            download, "_get_client", side_effect=record_thread
+        ), mock.patch.object(
+            download, "ensure_composed_lifecycle", side_effect=record_thread
+        ):
+            result = asyncio.run(
+                download.dataflux_download_async("", bucket_name, objects, None, params)
+            )
+        self.assertEqual(result, [b"one", b"two"])
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.main_thread(), threads)
+
+    def test_plan_groups(self):
+        objects = [("one", 2), ("two", 3), ("big", 10), ("three", 5)]
+        result = download._plan_groups(objects, 5)
+        expected_result = [
+            ("compose", [("one", 2), ("two", 3)]),
+            ("single", ("big", 10)),
+            ("single", ("three", 5)),
+        ]
+        self.assertEqual(result, expected_result)
+
+    def test_plan_groups_size_cap(self):
+        objects = [("one", 3), ("two", 2), ("three", 1), ("four", 4), ("five", 1)]
+        result = download._plan_groups(objects, 5)
+        expected_result = [
+            ("compose", [("one", 3), ("two", 2)]),
+            ("compose", [("three", 1), ("four", 4)]),
+            ("single", ("five", 1)),
+        ]
+        self.assertEqual(result, expected_result)
+
+    def test_pack_groups(self):
+        objects = [("a", 2), ("b", 5), ("big", 10), ("c", 3), ("d", 4), ("e", 1)]
+        plans, order = download._pack_groups(objects, 5)
+        expected_plans = [
+            ("single", ("big", 10)),
+            ("single", ("b", 5)),
+            ("compose", [("d", 4), ("e", 1)]),
+            ("compose", [("c", 3), ("a", 2)]),
+        ]
+        self.assertEqual(plans, expected_plans)
+        self.assertEqual(order, [2, 1, 4, 5, 3, 0])
+
+    def test_pack_groups_max_objects(self):
+        num_objects = download.MAX_NUM_OBJECTS_TO_COMPOSE + 1
+        objects = [(f"obj{i}", 1) for i in range(num_objects)]
+        plans, order = download._pack_groups(objects, num_objects)
+        self.assertEqual(len(plans), 2)
+        self.assertEqual(len(plans[0][1]), download.MAX_NUM_OBJECTS_TO_COMPOSE)
+        self.assertEqual(sorted(order), list(range(num_objects)))
+
     def test_dataflux_download_parallel(self):
         test_cases = [
             {"name": "exceed number of items", "procs": 4},
@@ -173,6 +793,57 @@ class DownloadTestCase(unittest.TestCase):
                     f"test {tc['desc']} expected only 3 objects in bucket, but found {len(bucket.blobs)}"
                 )
 
+    @mock.patch("dataflux_core.download.storage.Client")
+    def test_get_client(self, client_class):
+        download._DEFAULT_CLIENTS.clear()
+        first = download._get_client("project", pool_size=8)
+        second = download._get_client("project")
+        download._DEFAULT_CLIENTS.clear()
+        self.assertIs(first, second)
+        client_class.assert_called_once()
+        _, adapter = first._http.mount.call_args.args
+        self.assertEqual(adapter._pool_maxsize, 8)
+
+    def test_next_composite_name(self):
+        names = [
+            download._next_composite_name()
+            for _ in range(download._UUID_POOL_SIZE * 2 + 1)
+        ]
+        self.assertEqual(len(set(names)), len(names))
+        for name in names:
+            self.assertTrue(name.startswith(download.COMPOSED_PREFIX))
+            parsed = uuid.UUID(name[len(download.COMPOSED_PREFIX) :])
+            self.assertEqual(parsed.version, 4)
+
+    def test_get_bucket(self):
+        client = mock.Mock()
+        first = download._get_bucket(client, "test_bucket")
+        second = download._get_bucket(client, "test_bucket")
+        self.assertIs(first, second)
+        client.bucket.assert_called_once_with("test_bucket")
+
+    def test_get_bucket_does_not_keep_client_alive(self):
+        client = storage.Client(
+            project="test_project", credentials=AnonymousCredentials()
+        )
+        bucket = download._get_bucket(client, "test_bucket")
+        self.assertIs(download._get_bucket(client, "test_bucket"), bucket)
+        self.assertEqual(bucket.blob("one").client.project, "test_project")
+        client_ref = weakref.ref(client)
+        del client, bucket
+        gc.collect()
+        self.assertIsNone(client_ref())
+
+    def test_requests_use_modified_retry(self):
+        client = mock.Mock()
+        blob = client.bucket.return_value.blob.return_value
+        download.compose("", "test_bucket", "dest_name", [("one", 3)], client)
+        blob.compose.assert_called_once_with(mock.ANY, retry=download.MODIFIED_RETRY)
+        download.download_single(client, "test_bucket", "one")
+        blob.download_as_bytes.assert_called_once_with(retry=download.MODIFIED_RETRY)
+        download._safe_delete(blob)
+        blob.delete.assert_called_once_with(retry=download.MODIFIED_RETRY)
+
     def test_clean_composed_object(self):
         class ComposedObj:
             def __init__(self):
@@ -277,6 +277,26 @@ class FastListTest(unittest.TestCase):
                 f"got {got_total_size} results, want {object_count * object_size}"
             )
 
+    def test_list_controller_e2e_on_batch(self):
+        """End to end test of the fast list operation streaming results to a callback."""
+        client = fake_gcs.Client()
+        bucket_name = "test_bucket"
+        bucket = client.bucket(bucket_name)
+        object_count = 1000
+        for i in range(object_count):
+            bucket._add_file(str(i), "aaaaaaaaaa")
+        controller = fast_list.ListingController(1, "", bucket_name, True)
+        controller.client = client
+        batches = []
+        results = controller.run(on_batch=batches.append)
+        if results:
+            self.fail(f"got {len(results)} collected results, want none")
+        got = set()
+        for batch in batches:
+            got.update(batch)
+        if len(got) != object_count:
+            self.fail(f"got {len(got)} results, want {object_count}")
+
     def test_wait_for_work_success(self):
         """Tests waiting for work when there is still work remaining."""
         client = fake_gcs.Client()